@@ -1,33 +1,88 @@
 import streamlit as st
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
 import yfinance as yf
-from datetime import datetime, timedelta
-import ta
+from concurrent.futures import ThreadPoolExecutor
+
+# Download stock data (cached; minute bars go stale faster than daily/weekly ones)
+def download_stock_data(ticker, period, interval):
+    if period == '1wk':
+        period = '5d'
+    data = yf.Ticker(ticker).history(period=period, interval=interval, auto_adjust=False, raise_errors=True)
+    # Raise rather than return an empty frame so the failure is not cached
+    if data.empty:
+        raise ValueError(f"No data returned for {ticker}")
+    return data
+
+# One cached function per TTL tier; wrapping a shared function would share one cache
+@st.cache_data(ttl=30, max_entries=128, show_spinner=False)
+def download_intraday(ticker, period, interval):
+    return download_stock_data(ticker, period, interval)
+
+@st.cache_data(ttl=60, max_entries=128, show_spinner=False)
+def download_standard(ticker, period, interval):
+    return download_stock_data(ticker, period, interval)
+
+@st.cache_data(ttl=3600, max_entries=128, show_spinner=False)
+def download_daily(ticker, period, interval):
+    return download_stock_data(ticker, period, interval)
 
 # Fetch stock data
 def fetch_stock_data(ticker, period, interval):
     try:
-        end_date = datetime.now()
-        if period == '1wk':
-            start_date = end_date - timedelta(days=7)
-            data = yf.download(ticker, start=start_date, end=end_date, interval=interval)
-        else:
-            data = yf.download(ticker, period=period, interval=interval)
-        return data
+        if interval == '1m':
+            return download_intraday(ticker, period, interval)
+        if interval in ('1d', '1wk', '1mo'):
+            return download_daily(ticker, period, interval)
+        return download_standard(ticker, period, interval)
     except Exception as e:
         st.error(f"Error fetching data: {str(e)}")
         return None
 
+# Fetch the whole watchlist in one batched request
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_watchlist(symbols, period, interval):
+    data = yf.download(
+        " ".join(symbols),
+        period=period,
+        interval=interval,
+        group_by='ticker',
+        threads=True,
+        progress=False,
+        auto_adjust=False
+    )
+    # yf.download reports per-symbol failures as empty columns; raise on a total
+    # failure so it is not cached
+    returned = data.columns.get_level_values(0) if data.columns.nlevels > 1 else []
+    if not any(s in returned and not data[s].dropna(how='all').empty for s in symbols):
+        raise ValueError(f"No data returned for {', '.join(symbols)}")
+    return data
+
+# Fetch chart data, reusing the batched watchlist frame for watchlist symbols on 1m bars
+def fetch_chart_data(ticker, period, interval, watchlist):
+    if ticker in watchlist and (period, interval) == ('1d', '1m'):
+        try:
+            data = fetch_watchlist(tuple(watchlist), period, interval)[ticker].dropna(how='all')
+            if not data.empty:
+                return data
+        except Exception:
+            pass
+    return fetch_stock_data(ticker, period, interval)
+
+# Fetch a single watchlist symbol outside the script thread (watchlist bars are 1m)
+def fetch_watchlist_symbol(symbol, period, interval):
+    try:
+        return download_intraday(symbol, period, interval)
+    except Exception:
+        return None
+
 # Process data
 def process_data(data):
     try:
         if data is None or data.empty:
             return None
-        if data.index.tzinfo is None:
-            data.index = data.index.tz_localize('UTC')
-        data.index = data.index.tz_convert('US/Eastern')
+        index = data.index
+        data.index = (index.tz_localize('UTC') if index.tzinfo is None else index).tz_convert('US/Eastern')
         data.reset_index(inplace=True)
         data.rename(columns={'Date': 'Datetime'}, inplace=True)
         return data
@@ -38,96 +93,122 @@ def process_data(data):
 # Calculate metrics
 def calculate_metrics(data):
     try:
-        last_close = float(data['Close'].iloc[-1])
-        prev_close = float(data['Close'].iloc[0])
+        close = data['Close'].to_numpy()
+        last_close = close[-1]
+        prev_close = close[0]
         change = last_close - prev_close
         pct_change = (change / prev_close) * 100
-        high = float(data['High'].max())
-        low = float(data['Low'].min())
-        volume = int(data['Volume'].sum())
+        high = np.nanmax(data['High'].to_numpy())
+        low = np.nanmin(data['Low'].to_numpy())
+        volume = int(np.nansum(data['Volume'].to_numpy()))
         return last_close, change, pct_change, high, low, volume
     except Exception as e:
         st.error(f"Error calculating metrics: {str(e)}")
         return 0.0, 0.0, 0.0, 0.0, 0.0, 0
 
+# Compute SMA and EMA from a 1-D close array
+def compute_indicators(close, window):
+    # Running-sum SMA: each window sum is the difference of two cumulative sums.
+    # NaNs are summed as zero and counted separately so only windows containing one are NaN.
+    sma = np.full(len(close), np.nan)
+    if len(close) >= window:
+        missing = np.isnan(close)
+        csum = np.cumsum(np.where(missing, 0.0, close))
+        ncount = np.cumsum(missing)
+        window_sum = csum[window - 1:] - np.concatenate(([0.0], csum[:-window]))
+        window_missing = ncount[window - 1:] - np.concatenate(([0], ncount[:-window]))
+        sma[window - 1:] = np.where(window_missing > 0, np.nan, window_sum / window)
+    close_series = pd.Series(close, copy=False)
+    ema = close_series.ewm(span=window, adjust=False, min_periods=window).mean().to_numpy()
+    return sma, ema
+
 # Add technical indicators
 def add_technical_indicators(data):
     try:
         if data is None or 'Close' not in data.columns:
             return data
-        close_series = pd.Series(data['Close'].values.flatten(), index=data.index)
-        data['SMA_20'] = ta.trend.sma_indicator(close_series, window=20)
-        data['EMA_20'] = ta.trend.ema_indicator(close_series, window=20)
+        close = data['Close'].to_numpy(dtype=np.float64)
+        data['SMA_20'], data['EMA_20'] = compute_indicators(close, 20)
         return data
     except Exception as e:
         st.error(f"Error calculating indicators: {str(e)}")
         return data
 
-# Create chart
-def create_candlestick_chart(data, ticker, indicators):
-    try:
-        fig = make_subplots(
-            rows=2, cols=1,
-            shared_xaxes=True,
-            vertical_spacing=0.05,
-            row_heights=[0.7, 0.3],
-            subplot_titles=(f'{ticker} Stock Price', 'Volume')
-        )
+# Build chart (cached unpickled; st.plotly_chart only reads it). Hits only come from
+# repeated Update clicks on unchanged data within the TTL, since the chart is not
+# rendered on other reruns
+@st.cache_resource(ttl=60, max_entries=32, show_spinner=False)
+def build_candlestick_chart(data, ticker, indicators):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(
+        rows=2, cols=1,
+        shared_xaxes=True,
+        vertical_spacing=0.05,
+        row_heights=[0.7, 0.3],
+        subplot_titles=(f'{ticker} Stock Price', 'Volume')
+    )
+
+    # Add candlestick
+    fig.add_trace(
+        go.Candlestick(
+            x=data['Datetime'],
+            open=data['Open'],
+            high=data['High'],
+            low=data['Low'],
+            close=data['Close'],
+            name='OHLC'
+        ),
+        row=1, col=1
+    )
+
+    # Add volume
+    fig.add_trace(
+        go.Bar(
+            x=data['Datetime'],
+            y=data['Volume'],
+            name='Volume'
+        ),
+        row=2, col=1
+    )
 
-        # Add candlestick
+    # Add indicators
+    if 'SMA 20' in indicators:
         fig.add_trace(
-            go.Candlestick(
+            go.Scatter(
                 x=data['Datetime'],
-                open=data['Open'],
-                high=data['High'],
-                low=data['Low'],
-                close=data['Close'],
-                name='OHLC'
+                y=data['SMA_20'],
+                name='SMA 20',
+                line=dict(color='orange')
             ),
             row=1, col=1
         )
 
-        # Add volume
+    if 'EMA 20' in indicators:
         fig.add_trace(
-            go.Bar(
+            go.Scatter(
                 x=data['Datetime'],
-                y=data['Volume'],
-                name='Volume'
+                y=data['EMA_20'],
+                name='EMA 20',
+                line=dict(color='blue')
             ),
-            row=2, col=1
+            row=1, col=1
         )
 
-        # Add indicators
-        if 'SMA 20' in indicators:
-            fig.add_trace(
-                go.Scatter(
-                    x=data['Datetime'],
-                    y=data['SMA_20'],
-                    name='SMA 20',
-                    line=dict(color='orange')
-                ),
-                row=1, col=1
-            )
+    # Update layout
+    fig.update_layout(
+        height=800,
+        xaxis_rangeslider_visible=False,
+        template='plotly_dark'
+    )
 
-        if 'EMA 20' in indicators:
-            fig.add_trace(
-                go.Scatter(
-                    x=data['Datetime'],
-                    y=data['EMA_20'],
-                    name='EMA 20',
-                    line=dict(color='blue')
-                ),
-                row=1, col=1
-            )
-
-        # Update layout
-        fig.update_layout(
-            height=800,
-            xaxis_rangeslider_visible=False,
-            template='plotly_dark'
-        )
+    return fig
 
-        return fig
+# Create chart
+def create_candlestick_chart(data, ticker, indicators):
+    try:
+        return build_candlestick_chart(data, ticker, tuple(indicators))
     except Exception as e:
         st.error(f"Error creating chart: {str(e)}")
         return None
@@ -138,7 +219,7 @@ st.title('Real Time Stock Dashboard')
 
 # Sidebar parameters
 st.sidebar.header('Chart Parameters')
-ticker = st.sidebar.text_input('Ticker', 'MSFT')
+ticker = st.sidebar.text_input('Ticker', 'MSFT').strip().upper()
 time_period = st.sidebar.selectbox('Time Period', ['1d', '1wk', '1mo', '1y', 'max'])
 indicators = st.sidebar.multiselect('Technical Indicators', ['SMA 20', 'EMA 20'])
 
@@ -148,12 +229,15 @@ interval_mapping = {
     '1wk': '30m',
     '1mo': '1d',
     '1y': '1wk',
-    'max': '1wk'
+    'max': '1mo'
 }
 
+# Watchlist symbols
+watchlist = ['AAPL', 'GOOGL', 'AMZN', 'MSFT']
+
 # Main content
 if st.sidebar.button('Update'):
-    data = fetch_stock_data(ticker, time_period, interval_mapping[time_period])
+    data = fetch_chart_data(ticker, time_period, interval_mapping[time_period], watchlist)
     if data is not None:
         data = process_data(data)
         if data is not None:
@@ -180,24 +264,47 @@ if st.sidebar.button('Update'):
                 st.plotly_chart(fig, use_container_width=True)
 
 # Watchlist
-st.sidebar.header('Watchlist')
-watchlist = ['AAPL', 'GOOGL', 'AMZN', 'MSFT']
+@st.fragment(run_every=30)
+def render_watchlist():
+    st.header('Watchlist')
 
-for symbol in watchlist:
     try:
-        watch_data = fetch_stock_data(symbol, '1d', '1m')
-        if watch_data is not None:
-            watch_data = process_data(watch_data)
+        watchlist_data = fetch_watchlist(tuple(watchlist), '1d', '1m')
+    except Exception as e:
+        watchlist_data = None
+
+    watch_frames = {}
+    for symbol in watchlist:
+        try:
+            watch_frames[symbol] = watchlist_data[symbol].dropna(how='all')
+        except Exception as e:
+            watch_frames[symbol] = None
+
+    # Re-fetch symbols missing from the batch concurrently, keeping errors per symbol
+    missing = [s for s in watchlist if watch_frames[s] is None or watch_frames[s].empty]
+    if missing:
+        with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+            watch_frames.update(zip(missing, executor.map(lambda s: fetch_watchlist_symbol(s, '1d', '1m'), missing)))
+
+    for symbol in watchlist:
+        try:
+            watch_data = process_data(watch_frames[symbol])
             if watch_data is not None:
-                last_price = float(watch_data['Close'].iloc[-1])
-                prev_price = float(watch_data['Open'].iloc[0])
+                last_price = watch_data['Close'].to_numpy()[-1]
+                prev_price = watch_data['Open'].to_numpy()[0]
                 change = last_price - prev_price
                 pct_change = (change / prev_price) * 100
                 
-                st.sidebar.metric(
+                st.metric(
                     symbol,
                     f"${last_price:.2f}",
                     f"{change:+.2f} ({pct_change:+.2f}%)"
                 )
-    except Exception as e:
-        st.sidebar.metric(symbol, "N/A", "Error")
\ No newline at end of file
+            else:
+                st.metric(symbol, "N/A", "Error")
+        except Exception as e:
+            st.metric(symbol, "N/A", "Error")
+
+# Fragments cannot write to st.sidebar directly, so render inside its context
+with st.sidebar:
+    render_watchlist()
\ No newline at end of file